@@ -1,20 +1,35 @@
 """HK Conditions Monitor
 """
 
+import io
+import os
+import sys
 import time
+import bisect
+import select
+import functools
+import threading
+from types import MappingProxyType
 import xml.etree.ElementTree as ET
-from datetime import datetime
 import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
 
-# Default starting selections and refresh timing
-DEFAULTS = {
+# Default starting selections (read-only; main() works on a copy)
+DEFAULTS = MappingProxyType({
     "rain_district": "Central & Western",
     "aqhi_station": "Central/Western",
     "traffic_region": "Hong Kong Island",
-}
+})
+
+# Seconds before the dashboard refreshes by itself if no key is pressed
+REFRESH_SECONDS = 10
 
-# Menu options for rain districts (numbered list)
-RAIN_CHOICES = [
+# Seconds a refresh waits for new data before showing the last snapshot instead
+REFRESH_WAIT_SECONDS = 2
+
+# Menu options for rain districts (numbered list; tuples, because the menus never change)
+RAIN_CHOICES = (
     "Central & Western",
     "Eastern",
     "Southern",
@@ -28,10 +43,10 @@ RAIN_CHOICES = [
     "Tsuen Wan",
     "Tuen Mun",
     "Yuen Long",
-]
+)
 
 # Menu options for AQHI stations
-AQHI_CHOICES = [
+AQHI_CHOICES = (
     "Central/Western",
     "Eastern",
     "Kwun Tong",
@@ -40,25 +55,62 @@ AQHI_CHOICES = [
     "Tsuen Wan",
     "Tuen Mun",
     "Yuen Long",
-]
+)
 
 # Menu options for traffic regions
-TRAFFIC_CHOICES = [
+TRAFFIC_CHOICES = (
     "Hong Kong Island",
     "Kowloon",
     "New Territories",
     "Lantau Island",
     "Islands District",
-]
+)
 
-URLS = {
+# API address of each feed (read-only)
+URLS = MappingProxyType({
     "warnings": "https://data.weather.gov.hk/weatherAPI/opendata/weather.php?dataType=warnsum&lang=en",
     "rain": "https://data.weather.gov.hk/weatherAPI/opendata/weather.php?dataType=rhrread&lang=en",
     "aqhi": "https://dashboard.data.gov.hk/api/aqhi-individual?format=json",
     "traffic": "https://www.td.gov.hk/en/special_news/trafficnews.xml",
-}
-
-HTTP_HEADERS = {"User-Agent": "HKConditionsMonitor/1.0 (+https://data.gov.hk)"}
+})
+
+HTTP_HEADERS = MappingProxyType({"User-Agent": "HKConditionsMonitor/1.0 (+https://data.gov.hk)"})
+
+# One shared HTTP session, so connections to the APIs are kept open and reused.
+# The pool is big enough for the four feeds being fetched at the same time.
+# Failed connections and "server busy" answers (429, 5xx) are retried up to
+# 3 times, waiting a little longer before each new try. A feed that connects
+# but never answers is not retried, so it still gives up after `timeout`.
+SESSION = requests.Session()
+SESSION.headers.update(HTTP_HEADERS)
+SESSION.mount("https://", HTTPAdapter(
+    pool_connections=4,
+    pool_maxsize=8,
+    max_retries=Retry(
+        total=3,
+        read=0,
+        backoff_factor=0.3,
+        status_forcelist=(429, 500, 502, 503, 504),
+        allowed_methods=("GET",),
+        raise_on_status=False,
+    ),
+))
+
+# How many seconds a downloaded feed is reused before asking the API again
+# (the HK feeds themselves only update every few minutes)
+CACHE_SECONDS = MappingProxyType({
+    "warnings": 60,
+    "rain": 300,
+    "aqhi": 300,
+    "traffic": 120,
+})
+
+# Errors a download can hit: no network / bad answer, broken XML, broken JSON
+DOWNLOAD_ERRORS = (requests.RequestException, ET.ParseError, ValueError)
+
+# Last download of each feed: which -> (time downloaded, data)
+FEED_CACHE = {}
+FEED_CACHE_LOCK = threading.Lock()
 
 # ----------------------------- MAIN METHOD (FORMAT AND CALL METHODS) --------------------------- ISA
 
@@ -70,27 +122,116 @@ def main(): #----***************************************************************
     print("Commands: Enter=refresh, c=change locations, q=quit")
     print("Current choices are shown when changing locations.\n")
 
+    # The first time we have to wait for the data
+    snapshot = wait_for_snapshot(config)
+
+    # Download still running from an earlier refresh (None if there is none)
+    pending = None
+
     while True:
-        snapshot = collect_snapshot(config)
         print_snapshot(snapshot, config)
 
-        choice = input("\nEnter=refresh | c=change locations | q=quit: ").strip().lower()
+        # Wait for a command; if none comes in time, just refresh
+        choice = wait_for_command("\nEnter=refresh | c=change locations | q=quit: ", REFRESH_SECONDS)
         if choice == "q":
             break
         if choice == "c":
             change_locations(config)
+            # The old data is for the old locations, so wait for new data this time
+            snapshot = wait_for_snapshot(config)
+            pending = None
             continue
-        time.sleep(10) #CAN EDIT SLEEP TIME HERE!! -------------
+
+        # A download from an earlier refresh that finished a while ago (e.g. the
+        # user was away) holds old data: keep what it got, but download again
+        if pending is not None and pending["done"].is_set():
+            if time.time() - pending["finished"] > REFRESH_SECONDS:
+                snapshot = take_snapshot(pending, snapshot)
+                pending = None
+
+        # Start downloading new data for this refresh
+        if pending is None:
+            pending = start_collect(config)
+
+        # Wait a moment for it (cached feeds are ready at once). If the feeds are
+        # slow, keep showing the last snapshot instead of freezing the screen,
+        # and pick the new data up at the next refresh.
+        if pending["done"].wait(REFRESH_WAIT_SECONDS):
+            snapshot = take_snapshot(pending, snapshot)
+            pending = None
+        else:
+            print("(Still downloading new data - showing the last snapshot)")
 
 # ----------------------------- CALLS ALL FETCH METHODS AT ONCE --------------------------- ISA
 
+def start_collect(config): #----************************************************************************
+    """Fetch a snapshot in the background, so the screen never freezes; returns the job."""
+    # Pass a copy so later location changes do not affect a fetch in progress
+    return run_in_background(collect_snapshot, config.copy())
+
+def take_snapshot(job, snapshot): #----************************************************************************
+    """Return the snapshot a finished background job downloaded.
+
+    If the download failed, say so and return the last snapshot instead.
+    """
+    try:
+        return job_result(job)
+    except DOWNLOAD_ERRORS:
+        print("(Could not download new data - showing the last snapshot)")
+        return snapshot
+
+def wait_for_snapshot(config): #----************************************************************************
+    """Download a snapshot and wait for it, trying again if the download fails."""
+    while True:
+        try:
+            return collect_snapshot(config)
+        except DOWNLOAD_ERRORS:
+            print(f"(Could not download data - trying again in {REFRESH_SECONDS} seconds)")
+            time.sleep(REFRESH_SECONDS)
+
+def run_in_background(func, *args): #----************************************************************************
+    """Run func(*args) on its own thread and return a job dictionary.
+
+    job["done"] is set when the thread has finished; job["result"] then holds
+    what func returned, or job["error"] the exception it raised, and
+    job["finished"] the time it finished.
+    The threads are daemon threads, so pressing q quits right away instead of
+    waiting for a download that is still running.
+    """
+    job = {"done": threading.Event(), "result": None, "error": None, "finished": None}
+
+    def work():
+        try:
+            job["result"] = func(*args)
+        except BaseException as error:
+            job["error"] = error
+        finally:
+            job["finished"] = time.time()
+            job["done"].set()
+
+    threading.Thread(target=work, daemon=True).start()
+    return job
+
+def job_result(job): #----************************************************************************
+    """Wait for a background job; return its result, or raise the error it hit."""
+    job["done"].wait()
+    if job["error"] is not None:
+        raise job["error"]
+    return job["result"]
+
 def collect_snapshot(config): #----************************************************************************
-    # Pull one snapshot from each live API
+    # Pull one snapshot from each live API.
+    # All four requests run at once, so we only wait for the slowest one.
+    warnings = run_in_background(fetch_warning, config)
+    rain = run_in_background(fetch_rain, config)
+    aqhi = run_in_background(fetch_aqhi, config)
+    traffic = run_in_background(fetch_traffic, config)
+
     return {
-        "warnings": fetch_warning(config),
-        "rain": fetch_rain(config),
-        "aqhi": fetch_aqhi(config),
-        "traffic": fetch_traffic(config),
+        "warnings": job_result(warnings),
+        "rain": job_result(rain),
+        "aqhi": job_result(aqhi),
+        "traffic": job_result(traffic),
     }
 
 # ----------------------------- FETCH WARNING --------------------------- ZAHEER
@@ -104,11 +245,7 @@ def fetch_warning(config): #----************************************************
         return empty_warning()
 
     # Try to find the list of warning entries under a few possible keys
-    details = data.get("details")
-    if details is None:
-        details = data.get("warning")
-    if details is None:
-        details = data.get("data")
+    details = find_entries(data, [("details",), ("warning",), ("data",)])
 
     # If we still didn't find anything, treat it as "no warnings"
     if not details:
@@ -117,34 +254,16 @@ def fetch_warning(config): #----************************************************
     # Take the first entry as the "latest" warning
     ltst_warn = details[0]
 
-    # Try several possible fields to figure out the warning level
-    level = None
+    # Try several possible fields to figure out the warning level (skipping empty ones)
     levels = ["warningStatementCode", "warningMessageCode", "warningSignal", "warningType", "level"]
-
-    for lvl in levels:
-        value = ltst_warn.get(lvl)
-        if value:
-            level = value
-            break
-
-    if level is None:
-        level = "Unknown"
+    level = first_value(ltst_warn, levels, "Unknown", skip_empty=True)
 
     # Try several possible fields to figure out the warning message text
-    message = None
     messages = ["warningMessage", "message", "description"]
-
-    for mssg in messages:
-        value = ltst_warn.get(mssg)
-        if value:
-            message = value
-            break
-
-    if message is None:
-        message = "No description."
+    message = first_value(ltst_warn, messages, "No description.", skip_empty=True)
 
     # Use the entry timestamp if possible; otherwise, use the current time
-    updated = ltst_warn.get("updateTime") or ltst_warn.get("issueTime")
+    updated = first_value(ltst_warn, ["updateTime", "issueTime"], skip_empty=True)
     if updated is None:
         updated = get_time()
 
@@ -161,37 +280,30 @@ def fetch_rain(config): #----***************************************************
     data = get_data("rain")
 
     # The API usually puts the readings under ["rainfall"]["data"]
-    # If anything is missing, just use an empty list
-
-    rows = []
-
-    if "rainfall" in data:
-        rainfall = data["rainfall"]
-        if "data" in rainfall:
-            rows = rainfall["data"]
-
-    # Keep only items that are dictionaries
-    entries = []
-    for row in rows:
-        if isinstance(row, dict):
-            entries.append(row)
+    # If anything is missing, we just get an empty list
+    entries = find_entries(data, [("rainfall", "data")])
 
     # Which district did the user pick?
     district = config["rain_district"]
 
-    # Find exact match for the district name
-    entry = None
+    # Index the readings by place name in one pass: by the exact name and by
+    # the normalized name (ignoring " District", case, etc.). First row wins.
+    # Rows whose place is not a string can't be a match, so skip them.
+    by_place = {}
+    by_norm = {}
     for row in entries:
-        if row.get("place") == district:
-            entry = row
-            break
+        place = row.get("place")
+        if not isinstance(place, str):
+            continue
+        by_place.setdefault(place, row)
+        by_norm.setdefault(norm(place), row)
 
-    # If that fails, try a normalized match (ignoring " District", case, etc.)
+    # Find exact match for the district name
+    entry = by_place.get(district)
+
+    # If that fails, try a normalized match
     if entry is None:
-        for row in entries:
-            if norm(row.get("place")) == norm(district):
-                entry = row
-                break
+        entry = by_norm.get(norm(district))
 
     # If we did not find anything, say "No data" for that district
     if entry is None:
@@ -202,11 +314,7 @@ def fetch_rain(config): #----***************************************************
         }
 
     # If we did find something, try to read the rain amount from a few possible fields
-    value = entry.get("max")
-    if value is None:
-        value = entry.get("value")
-    if value is None:
-        value = entry.get("mm")
+    value = first_value(entry, ["max", "value", "mm"])
 
     try:
         value = float(value)
@@ -217,9 +325,7 @@ def fetch_rain(config): #----***************************************************
     category = categorize_rain(value)
 
     # Try to get a time for this reading
-    updated = entry.get("recordTime")
-    if updated is None:
-        updated = entry.get("time")
+    updated = first_value(entry, ["recordTime", "time"])
     if updated is None:
         updated = get_time()
 
@@ -236,34 +342,29 @@ def fetch_aqhi(config): #----***************************************************
     # Ask the API for AQHI data
     data = get_data("aqhi")
 
-    # Build a simple list of station dictionaries from whatever the API gave us
-    stations = []
-
-    if isinstance(data, list):
-        # Sometimes the API is already a list of stations
-        for row in data:
-            if isinstance(row, dict):
-                stations.append(row)
-    elif isinstance(data, dict):
-        # Other times the stations are inside "aqhi" or "data"
-        raw = data.get("aqhi")
-        if raw is None:
-            raw = data.get("data")
-
-        if isinstance(raw, list):
-            for row in raw:
-                if isinstance(row, dict):
-                    stations.append(row)
+    # Build a simple list of station dictionaries from whatever the API gave us.
+    # Sometimes the API is already a list of stations, other times the
+    # stations are inside "aqhi" or "data"
+    stations = find_entries(data, [(), ("aqhi",), ("data",)])
 
     # Which station did the user pick?
     target_station = config["aqhi_station"]
 
-    # Try to find that station in the list
-    entry = None
+    # Index the stations by name in one pass (exact and normalized names, first row wins).
+    # Rows whose station is not a string can't be a match, so skip them.
+    by_station = {}
+    by_norm = {}
     for row in stations:
-        if row.get("station") == target_station:
-            entry = row
-            break
+        station = row.get("station")
+        if not isinstance(station, str):
+            continue
+        by_station.setdefault(station, row)
+        by_norm.setdefault(norm(station), row)
+
+    # Try to find that station: exact name first, then ignoring case and spaces
+    entry = by_station.get(target_station)
+    if entry is None:
+        entry = by_norm.get(norm(target_station))
 
     # If we did not find anything, return "No data" for that station
     if entry is None:
@@ -275,11 +376,7 @@ def fetch_aqhi(config): #----***************************************************
         }
 
     # Try to read the AQHI number from a few possible fields
-    raw_value = entry.get("aqhi")
-    if raw_value is None:
-        raw_value = entry.get("value")
-    if raw_value is None:
-        raw_value = entry.get("index")
+    raw_value = first_value(entry, ["aqhi", "value", "index"])
 
     try:
         value = float(raw_value)
@@ -287,18 +384,12 @@ def fetch_aqhi(config): #----***************************************************
         value = 0.0
 
     # Work out the risk category (e.g. "High", "Moderate", etc.)
-    category = entry.get("health_risk")
-    if category is None:
-        category = entry.get("category")
+    category = first_value(entry, ["health_risk", "category"])
     if category is None:
         category = categorize_aqhi(value)
 
     # Try to figure out when this reading was updated
-    timestamp = entry.get("time")
-    if timestamp is None:
-        timestamp = entry.get("publish_date")
-    if timestamp is None:
-        timestamp = entry.get("updateTime")
+    timestamp = first_value(entry, ["time", "publish_date", "updateTime"])
 
     # If we still have no time, fall back to "now"
     if timestamp is None:
@@ -334,27 +425,13 @@ def fetch_traffic(config): #----************************************************
         }
 
     # Work out the severity (e.g. "Info", "Serious", etc.)
-    severity = entry.get("severity")
-    if severity is None:
-        severity = entry.get("category")
-    if severity is None:
-        severity = entry.get("status")
-    if severity is None:
-        severity = "Info"
+    severity = first_value(entry, ["severity", "category", "status"], "Info")
 
     # Work out the description of what is happening
-    description = entry.get("content")
-    if description is None:
-        description = entry.get("description")
-    if description is None:
-        description = entry.get("summary")
-    if description is None:
-        description = "Traffic update"
+    description = first_value(entry, ["content", "description", "summary"], "Traffic update")
 
     # Try to figure out when this incident was last updated
-    updated = entry.get("update_time")
-    if updated is None:
-        updated = entry.get("updateTime")
+    updated = first_value(entry, ["update_time", "updateTime"])
 
     # If we still have no time, fall back to "now"
     if updated is None:
@@ -372,21 +449,34 @@ def get_data(which): #----******************************************************
     """Fetch data from one of the HK API endpoints.
     which: a string like 'warnings', 'rain', 'aqhi', or 'traffic'
     """
+    # If we downloaded this feed recently, reuse it instead of calling the API
+    now = time.monotonic()
+    with FEED_CACHE_LOCK:
+        cached = FEED_CACHE.get(which)
+    if cached is not None and now - cached[0] < CACHE_SECONDS[which]:
+        return cached[1]
+
     # Pick the right URL based on the kind of data we want
     url = URLS[which]
 
     # Ask the server for data
-    response = requests.get(url, timeout=10, headers=HTTP_HEADERS)
+    response = SESSION.get(url, timeout=10)
 
     # If the HTTP status is not OK (e.g. 404, 500), this will raise an error
     response.raise_for_status()
 
     # Traffic feed is XML, so parse it with our XML helper
+    # Everything else is JSON
     if which == "traffic":
-        return parse_traffic_xml(response.text)
+        data = parse_traffic_xml(response.text)
+    else:
+        data = response.json()
 
-    # Everything else is JSON
-    return response.json()
+    # Remember it for the next refreshes
+    with FEED_CACHE_LOCK:
+        FEED_CACHE[which] = (now, data)
+
+    return data
 
 # ----------------------------- GENERAL HELPER FUNCTIONS --------------------------- EVERYONE
 
@@ -397,28 +487,100 @@ def empty_warning(): #----******************************************************
         "updated_at": get_time(),
     }
 
+def find_entries(data, paths): #----************************************************************************
+    """Find the list of records inside an API payload.
+
+    paths: key paths to try in order, e.g. [("rainfall", "data"), ("data",)].
+    An empty path () means the payload itself. Only dictionary items are kept.
+    """
+    for path in paths:
+        # Follow the keys one by one, stopping if something is missing
+        node = data
+        for key in path:
+            if not isinstance(node, dict):
+                node = None
+                break
+            node = node.get(key)
+
+        # The first path that leads to a list wins
+        if isinstance(node, list):
+            return [item for item in node if isinstance(item, dict)]
+
+    # If we did not find anything usable, return an empty list
+    return []
+
+def first_value(entry, keys, default=None, skip_empty=False): #----************************************************************************
+    """Return the value of the first key in `keys` that is set (not None) in entry.
+
+    With skip_empty=True, empty values like "" also count as not set.
+    """
+    for key in keys:
+        value = entry.get(key)
+        if value is None:
+            continue
+        if skip_empty and not value:
+            continue
+        return value
+
+    # None of the keys had a value
+    return default
+
+# Ending removed from place names by norm(), e.g. "Eastern District" -> "eastern"
+DISTRICT_SUFFIX = " district"
+DISTRICT_SUFFIX_LENGTH = len(DISTRICT_SUFFIX)
+
 def norm(text): #----************************************************************************
     """Make a place name easier to compare."""
     # If it's not a string, just return empty string
     if not isinstance(text, str):
         return ""
 
+    return norm_name(text)
+
+@functools.lru_cache(maxsize=512)
+def norm_name(name): #----************************************************************************
+    """norm() for strings. The same few dozen names come back on every refresh, so results are cached."""
     # Remove spaces at the edges and make everything lowercase
-    name = text.strip().lower()
+    name = name.strip().lower()
 
     # If it ends with " district", remove that part
-    if name.endswith(" district"):
-        name = name[:-len(" district")]
+    if name.endswith(DISTRICT_SUFFIX):
+        name = name[:-DISTRICT_SUFFIX_LENGTH]
 
     return name
 
+# The last timestamp text we made, as (second, text)
+LAST_TIME = (0, "")
+
 def get_time(): #----************************************************************************
-    """Return timestamp"""
-    now = datetime.now()
-    return now.strftime("%Y-%m-%d %H:%M:%S")
+    """Return timestamp (reused if one was already made in the same second)"""
+    global LAST_TIME
+    now = int(time.time())
+    if now != LAST_TIME[0]:
+        LAST_TIME = (now, time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(now)))
+    return LAST_TIME[1]
 
 # ---------------------------- TRAFFIC HELPER FUNCTIONS --------------------------- BETO
 
+# The XML tags that parse_traffic_xml actually uses
+TRAFFIC_TAG_NAMES = (
+    "district_en", "region",
+    "incident_heading_en", "severity",
+    "content_en", "incident_detail_en",
+    "announcement_date",
+    "location_en",
+    "direction_en",
+    "incident_status_en",
+)
+
+# Tag as written in the feed -> lowercase name. The TD feed uses upper-case
+# tags, so both spellings are listed here once instead of lowercasing every tag.
+TRAFFIC_TAGS = {
+    spelling: name
+    for name in TRAFFIC_TAG_NAMES
+    for spelling in (name, name.upper())
+}
+
 def parse_traffic_xml(text): #----**************************************************************** BETO
     """Convert the XML traffic feed into a dictionary with a list of incidents.
 
@@ -434,25 +596,29 @@ def parse_traffic_xml(text): #----**********************************************
                     "direction": ...,
                     "description": ...,
                     "status": ...,
+                    "search_text": ...,  # lowercase text pick_traffic_entry() searches
                 },
                 ...
             ]
         }
     """
-    # Turn the XML string into an XML tree
-    root = ET.fromstring(text)
-
     # This will hold one dictionary per traffic incident
     incidents = []
 
-    # Go through every <message> element in the XML
-    for message in root.findall(".//message"):
-        # First, read all child tags under <message> into a simple dictionary.
+    # Read the XML one element at a time. Each <message> element is handled
+    # as soon as it has been read completely, so we never hold the whole tree.
+    for _event, message in ET.iterparse(io.StringIO(text)):
+        if message.tag != "message":
+            continue
+
+        # First, read the child tags we use under <message> into a simple dictionary.
         # Example: <district_en>Hong Kong Island</district_en>
         # becomes data["district_en"] = "Hong Kong Island"
         data = {}
         for child in message:
-            tag_name = child.tag.lower()           # tag name as lowercase string
+            tag_name = TRAFFIC_TAGS.get(child.tag)   # tag name as lowercase string
+            if tag_name is None:
+                continue                             # skip fields we never show
             text_value = (child.text or "").strip()  # text inside the tag (or "" if None)
             data[tag_name] = text_value
 
@@ -483,40 +649,23 @@ def parse_traffic_xml(text): #----**********************************************
             "status": data.get("incident_status_en"),
         }
 
+        # Prepare the lowercase text used to match regions, once per download
+        incident["search_text"] = traffic_search_text(incident)
+
         incidents.append(incident)
 
+        # We are done with this <message>, free its children
+        message.clear()
+
     # Wrap the list in a dict so extract_traffic_entries() can find "trafficnews"
     return {"trafficnews": incidents}
 
 
 def extract_traffic_entries(data): #----**************************************************************** BETO
     """Turn the raw traffic data into a simple list of incident dictionaries."""
-    incidents = []
-
     # Case 1: the data is already a list of dictionaries
-    if isinstance(data, list):
-        for item in data:
-            if isinstance(item, dict):
-                incidents.append(item)
-        return incidents
-
-    # Case 2: the data is a dictionary and the list is inside it
-    if isinstance(data, dict):
-        # Try a few possible keys where the API might store the list
-        possible_keys = ["trafficnews", "incidents", "messages", "data"]
-
-        for key in possible_keys:
-            raw = data.get(key)
-
-            # If we find a list under this key, keep only the dict items
-            if isinstance(raw, list):
-                for item in raw:
-                    if isinstance(item, dict):
-                        incidents.append(item)
-                return incidents
-
-    # If we did not find anything usable, return an empty list
-    return incidents
+    # Case 2: the data is a dictionary and the list is under one of a few keys
+    return find_entries(data, [(), ("trafficnews",), ("incidents",), ("messages",), ("data",)])
 
 
 def pick_traffic_entry(incidents, target_region): #----********************************************** BETO
@@ -536,16 +685,10 @@ def pick_traffic_entry(incidents, target_region): #----*************************
 
     # Go through each incident and see if it mentions the region
     for entry in incidents:
-        # Collect different text fields from the incident
-        parts = []
-
-        for field in ["region", "location", "direction", "content", "description"]:
-            value = entry.get(field)
-            if value:
-                parts.append(str(value))
-
-        # Join everything into one big lowercase string
-        joined = " ".join(parts).lower()
+        # Use the text prepared by parse_traffic_xml (or build it now)
+        joined = entry.get("search_text")
+        if joined is None:
+            joined = traffic_search_text(entry)
 
         # If our target text appears anywhere inside this incident text, pick it
         if target in joined:
@@ -555,104 +698,167 @@ def pick_traffic_entry(incidents, target_region): #----*************************
     return incidents[0]
 
 
+def traffic_search_text(entry): #----********************************************** BETO
+    """Join the text fields of an incident into one big lowercase string."""
+    # Collect different text fields from the incident
+    parts = []
+
+    for field in ["region", "location", "direction", "content", "description"]:
+        value = entry.get(field)
+        if value:
+            parts.append(str(value))
+
+    return " ".join(parts).lower()
+
+
 # -------------------------------- CATEGORIZING FUNCTIONS ------------------------------------- RAKHAT
 
+# Each label starts at its threshold: e.g. rain >= 5 mm is "Amber Rain", >= 15 mm is "Red Rain"
+RAIN_THRESHOLDS = (1, 5, 15, 30)
+RAIN_LABELS = ("Dry", "Showers", "Amber Rain", "Red Rain", "Black Rain")
+
+AQHI_THRESHOLDS = (3, 4, 7, 10)
+AQHI_LABELS = ("Low", "Moderate", "High", "Very High", "Serious")
+
 def categorize_rain(value): #----************************************************************************
-    if value >= 30:
-        return "Black Rain"
-    if value >= 15:
-        return "Red Rain"
-    if value >= 5:
-        return "Amber Rain"
-    if value >= 1:
-        return "Showers"
-    return "Dry"
+    # A "nan" reading is not a number at all (nan != nan), so give it the lowest label
+    if value != value:
+        return RAIN_LABELS[0]
+    # bisect counts how many thresholds the value has reached
+    return RAIN_LABELS[bisect.bisect_right(RAIN_THRESHOLDS, value)]
 
 
 def categorize_aqhi(value): #----************************************************************************
-    if value >= 10:
-        return "Serious"
-    if value >= 7:
-        return "Very High"
-    if value >= 4:
-        return "High"
-    if value >= 3:
-        return "Moderate"
-    return "Low"
+    if value != value:
+        return AQHI_LABELS[0]
+    return AQHI_LABELS[bisect.bisect_right(AQHI_THRESHOLDS, value)]
 
 # USER INTEFACE ------------------ COMMAND LINE FORMATTING FUNCTIONS ---------------------- BENNETT
 
+# Lines that frame the dashboard (built once, reused on every refresh)
+BORDER_LINE = "=" * 60
+DIVIDER_LINE = "-" * 60
+
+# Each section title with its underline, e.g. "\nRain\n----"
+SECTION_HEADERS = {
+    title: "\n" + title + "\n" + "-" * len(title)
+    for title in ("Warnings", "Rain", "AQHI", "Traffic")
+}
+
 def print_snapshot(snapshot, config): #----************************************************************************
-    print("\n============================================================")
-    print("District:", config["rain_district"],
-          "| AQHI:", config["aqhi_station"],
-          "| Traffic:", config["traffic_region"])
-    print("------------------------------------------------------------")
+    # Build the whole dashboard first, then write it to the screen in one go
+    lines = [
+        "\n" + BORDER_LINE,
+        selection_line(config["rain_district"], config["aqhi_station"], config["traffic_region"]),
+        DIVIDER_LINE,
+    ]
+
+    # Each section: its header, then its data formatted as text
+    for header, key, formatter in SNAPSHOT_SECTIONS:
+        lines.append(header)
+        lines.append(formatter(snapshot[key]))
 
-    print("\nWarnings")
-    print("--------")
-    print_warning(snapshot["warnings"])
+    lines.append(BORDER_LINE)
+    sys.stdout.write("\n".join(lines) + "\n")
 
-    print("\nRain")
-    print("----")
-    print_rain(snapshot["rain"])
+@functools.lru_cache(maxsize=1)
+def selection_line(district, station, region): #----************************************************************************
+    """Line showing the current choices (only rebuilt when a choice changes)."""
+    return f"District: {district} | AQHI: {station} | Traffic: {region}"
 
-    print("\nAQHI")
-    print("----")
-    print_aqhi(snapshot["aqhi"])
+# Text layout of each section; the {names} are filled from the snapshot row
+WARNING_TEMPLATE = "Level: {level}\nMessage: {message}\nUpdated: {updated_at}"
+RAIN_TEMPLATE = "District: {district}\nIntensity: {intensity}\nUpdated: {updated_at}"
+AQHI_TEMPLATE = "Station: {station}\nCategory: {category}\nValue: {value}\nUpdated: {updated_at}"
+TRAFFIC_TEMPLATE = "Severity: {severity}\n{description}\nUpdated: {updated_at}"
 
-    print("\nTraffic")
-    print("-------")
-    print_traffic(snapshot["traffic"])
+def format_warning(row): #----************************************************************************
+    return WARNING_TEMPLATE.format_map(row)
 
-    print("============================================================")
 
-def print_warning(row): #----************************************************************************
-    print("Level:", row["level"])
-    print("Message:", row["message"])
-    print("Updated:", row["updated_at"])
+def format_rain(row): #----************************************************************************
+    return RAIN_TEMPLATE.format_map(row)
 
 
-def print_rain(row): #----************************************************************************
-    print("District:", row["district"])
-    print("Intensity:", row["intensity"])
-    print("Updated:", row["updated_at"])
 
+def format_aqhi(row): #----************************************************************************
+    return AQHI_TEMPLATE.format_map(row)
 
 
-def print_aqhi(row): #----************************************************************************
-    print("Station:", row["station"])
-    print("Category:", row["category"])
-    print("Value:", row["value"])
-    print("Updated:", row["updated_at"])
+def format_traffic(row): #----************************************************************************
+    return TRAFFIC_TEMPLATE.format_map(row)
 
 
-def print_traffic(row): #----************************************************************************
-    print("Severity:", row["severity"])
-    print(row["description"])
-    print("Updated:", row["updated_at"])
+# The dashboard sections in order: (header, snapshot key, formatter)
+SNAPSHOT_SECTIONS = (
+    (SECTION_HEADERS["Warnings"], "warnings", format_warning),
+    (SECTION_HEADERS["Rain"], "rain", format_rain),
+    (SECTION_HEADERS["AQHI"], "aqhi", format_aqhi),
+    (SECTION_HEADERS["Traffic"], "traffic", format_traffic),
+)
 
 
 #-------------------------------------------------------- ISA
 
+def wait_for_command(prompt, timeout): #----************************************************* ISA
+    """Ask for a command, but stop waiting after `timeout` seconds.
+
+    Returns "" (the same as pressing Enter) if nothing was typed in time.
+    On Windows select() cannot watch the keyboard, so we simply wait for a line.
+    Piped input is read straight away too: select() cannot see lines that
+    Python has already read ahead into its own buffer.
+    """
+    if os.name == "nt" or not sys.stdin.isatty():
+        return read_line(prompt).strip().lower()
+
+    # Show the prompt, then wait until a line is typed or the time runs out
+    print(prompt, end="", flush=True)
+    ready, _, _ = select.select([sys.stdin], [], [], timeout)
+    if not ready:
+        print()
+        return ""
+
+    return read_line().strip().lower()
+
+
+def read_line(prompt=""): #----************************************************* ISA
+    """Read one line from the user (like input(), but works nicely with piped input).
+
+    When the input is not a terminal (e.g. a script pipes commands in), read
+    straight from sys.stdin instead of input(); wait_for_command() also comes
+    straight here, so commands already in the pipe are never left waiting.
+    At the end of piped input we return "q" so the program quits instead of crashing.
+    """
+    if sys.stdin.isatty():
+        return input(prompt)
+
+    sys.stdout.write(prompt)
+    sys.stdout.flush()
+    line = sys.stdin.readline()
+    if line == "":
+        return "q"
+    return line
+
+
 def select_from_list(title, options, current): #----************************************************* ISA
     """Show a numbered menu and let the user pick an option.
 
     - Press Enter to keep the current value.
     - Type a number to choose a new option.
     """
-    # Show the menu title
-    print("\n" + title + ":")
-
-    # Print each option with a number (1, 2, 3, ...)
+    # Build the menu: the title, then each option with a number (1, 2, 3, ...)
+    lines = ["\n" + title + ":"]
     number = 1
     for option in options:
-        print(f"  {number}. {option}")
+        lines.append(f"  {number}. {option}")
         number = number + 1
 
+    # Show the whole menu at once
+    sys.stdout.write("\n".join(lines) + "\n")
+
     # Ask the user what they want
     prompt = f"Choose 1-{len(options)} (current: {current}, Enter to keep): "
-    choice = input(prompt).strip()
+    choice = read_line(prompt).strip()
 
     # If they just press Enter, keep the current value
     if choice == "":